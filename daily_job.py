@@ -1,12 +1,25 @@
 import os
+import io
 import json
-import re
+import hashlib
+import sqlite3
+import threading
+import time
+import zipfile
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from collections import namedtuple
+from functools import lru_cache
+from xml.sax.saxutils import escape
 from zoneinfo import ZoneInfo
 
+import openai
+import orjson
 import requests
 from dotenv import load_dotenv
-from docx import Document
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # === LOAD ENV ===
 load_dotenv()
@@ -21,6 +34,15 @@ TIMEZONE = os.getenv("TIMEZONE", "Europe/Kyiv")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 MODEL_NAME = "deepseek/deepseek-chat"
+AI_MAX_WORKERS = 8
+# comments folded into the summary call; the rest go per task (bounds max_tokens)
+AI_FUSED_COMMENTS_MAX = 8
+# Notion rejects a rich_text item longer than this
+NOTION_TEXT_LIMIT = 2000
+
+# AI comment cache (recurring tasks get the same prompt every day)
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", "ai_cache.sqlite")
+AI_CACHE_TTL_SECONDS = 14 * 24 * 60 * 60
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -32,12 +54,127 @@ DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 # Advice file (exported Notion page "ЗАМЕТКИ И СТРАТЕГИИ")
 ADVICE_FILE_PATH = os.getenv("ADVICE_FILE_PATH", "notes_strategies.txt")
 
+# Local cache for Notion snapshots between runs (NOTION_CACHE_BUST=1 skips it)
+CACHE_DIR = os.path.expanduser(os.getenv("CACHE_DIR", "~/.cache/notion_daily"))
+STRATEGY_CACHE_TTL_SECONDS = 60 * 60
+NOTION_CACHE_BUST = os.getenv("NOTION_CACHE_BUST") == "1"
+
+# DOCX template with {{...}} placeholders (see build_plan_docx)
+PLAN_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "plan_template.docx"
+)
+
 # Notion headers
 HEADERS = {
     "Authorization": f"Bearer {NOTION_API_KEY}",
     "Notion-Version": "2022-06-28",
     "Content-Type": "application/json",
+    "Accept-Encoding": "gzip",
 }
+# Notion allows ~3 req/s per integration. NOTION_MAX_WORKERS only bounds
+# requests in flight; the rate itself is paced by _notion_throttle()
+NOTION_MAX_WORKERS = 3
+NOTION_RATE_PER_SEC = 3
+
+# Only these properties are read by the job; the rest is not downloaded
+TASK_PROPERTIES = (
+    "Name",
+    "Status",
+    "Type",
+    "Complexity",
+    "Auto-roll?",
+    "Rollovers",
+    "Planned duration (min)",
+    "Actual duration (min)",
+)
+STRATEGY_PROPERTIES = ("Name", "Status", "Priority", "Horizon")
+
+
+# ---------------------------------------------------------
+# HTTP SESSIONS (keep-alive + retries)
+# ---------------------------------------------------------
+def _make_adapter():
+    # Telegram / Discord calls are all POSTs: retry only 429 (the message was
+    # not accepted) and wait out Retry-After. A 5xx or a read timeout may
+    # already have delivered it, so those are not replayed (read=False)
+    retry = Retry(
+        total=3,
+        read=False,
+        backoff_factor=0.3,
+        status_forcelist=[429],
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+
+
+class _PageCreateRetry(Retry):
+    """
+    POST /v1/pages is not idempotent: after a 5xx or a read timeout the page
+    may already exist. Page creation is retried only on 429, which Notion
+    guarantees was not processed; other methods keep the normal policy.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST":
+            return status_code == 429
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def _make_notion_adapter(retry_cls=Retry, methods=("GET", "POST", "PATCH")):
+    # Notion rate-limits with 429 + Retry-After; queries (POST) and updates
+    # (PATCH) are retried too, otherwise one 429 kills the whole run
+    retry = retry_cls(
+        total=8,
+        backoff_factor=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(methods),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+
+
+_notion_lock = threading.Lock()
+_notion_next_at = 0.0
+
+
+def _notion_throttle():
+    """Не чаще NOTION_RATE_PER_SEC запросов в секунду — на все потоки сразу."""
+    global _notion_next_at
+    with _notion_lock:
+        now = time.monotonic()
+        wait = _notion_next_at - now
+        _notion_next_at = max(now, _notion_next_at) + 1 / NOTION_RATE_PER_SEC
+    if wait > 0:
+        time.sleep(wait)
+
+
+class _ThrottledSession(requests.Session):
+    def request(self, *args, **kwargs):
+        _notion_throttle()
+        return super().request(*args, **kwargs)
+
+
+# Notion: auth headers live on the session, so they never leak to other hosts
+NOTION_SESSION = _ThrottledSession()
+NOTION_SESSION.headers.update(HEADERS)
+NOTION_SESSION.mount("https://api.notion.com", _make_notion_adapter())
+# longest prefix wins: create_page (POST) retries only on 429, and without
+# POST in allowed_methods a read timeout is not replayed either;
+# update_page (PATCH /v1/pages/{id}) keeps the full policy
+NOTION_SESSION.mount(
+    "https://api.notion.com/v1/pages",
+    _make_notion_adapter(_PageCreateRetry, ("GET", "PATCH")),
+)
+
+# Telegram / Discord: one session, so sendMessage + sendDocument (and the
+# two webhook posts) reuse the same TLS connection per host
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://api.telegram.org", _make_adapter())
+HTTP_SESSION.mount("https://discord.com", _make_adapter())
+HTTP_SESSION.mount("https://discordapp.com", _make_adapter())
 
 # ---------------------------------------------------------
 # DAILY RECURRING TASKS TEMPLATES
@@ -70,43 +207,100 @@ DAILY_RECURRING_TASKS = [
     },
 ]
 
+# Properties that are the same for every new recurring task
+_RECURRING_STATIC_PROPS = {
+    "Status": {"select": {"name": "Todo"}},
+    "Auto-roll?": {"checkbox": False},
+    "Rollovers": {"number": 0},
+    "Actual duration (min)": {"number": 0},
+}
+
 
 # =========================================================
 # 📅 DATE HELPERS
 # =========================================================
+_TZ = ZoneInfo(TIMEZONE)
+
+
 def get_today():
-    tz = ZoneInfo(TIMEZONE)
-    return datetime.now(tz).date()
+    return datetime.now(_TZ).date()
 
 
-def get_yesterday():
-    return get_today() - timedelta(days=1)
+def get_yesterday(today=None):
+    return (today or get_today()) - timedelta(days=1)
 
 
-def get_tomorrow():
-    return get_today() + timedelta(days=1)
+def get_tomorrow(today=None):
+    return (today or get_today()) + timedelta(days=1)
 
 
-def get_target_day_for_summary():
+def get_target_day_for_summary(today=None):
     """Всегда делаем summary за вчерашний день."""
-    return get_yesterday()
+    return get_yesterday(today)
+
+
+# =========================================================
+# ⚡ CONCURRENCY
+# =========================================================
+def run_parallel(fn, items, max_workers):
+    """Вызывает fn для каждого элемента в пуле потоков, порядок сохраняется."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as ex:
+        return list(ex.map(fn, items))
 
 
 # =========================================================
 # 🔧 BASIC NOTION API
 # =========================================================
-def query_database(db_id, payload=None):
+@lru_cache(maxsize=None)
+def get_property_ids(db_id):
+    """{имя свойства: id} для базы — нужно для filter_properties."""
+    url = f"https://api.notion.com/v1/databases/{db_id}"
+    res = NOTION_SESSION.get(url)
+    res.raise_for_status()
+    data = orjson.loads(res.content)
+    return {name: prop["id"] for name, prop in data["properties"].items()}
+
+
+def _query_url(db_id, filter_properties=None):
     url = f"https://api.notion.com/v1/databases/{db_id}/query"
-    res = requests.post(url, headers=HEADERS, json=payload or {})
+    if filter_properties:
+        ids = get_property_ids(db_id)
+        # property ids приходят уже url-encoded → не пропускаем их через params=
+        query = "&".join(
+            f"filter_properties={ids[name]}" for name in filter_properties if name in ids
+        )
+        if query:
+            url = f"{url}?{query}"
+    return url
+
+
+def query_database(db_id, payload=None, filter_properties=None):
+    url = _query_url(db_id, filter_properties)
+    res = NOTION_SESSION.post(url, data=orjson.dumps(payload or {}))
     res.raise_for_status()
-    return res.json()
+    return orjson.loads(res.content)
+
+
+def query_database_all(db_id, payload=None, filter_properties=None):
+    """Идем по всем страницам результата (Notion отдает максимум 100 за раз)."""
+    body = dict(payload or {})
+    body.setdefault("page_size", 100)
+    while True:
+        data = query_database(db_id, body, filter_properties)
+        yield from data["results"]
+        if not data.get("has_more"):
+            return
+        body["start_cursor"] = data["next_cursor"]
 
 
 def update_page(page_id, payload):
     url = f"https://api.notion.com/v1/pages/{page_id}"
-    res = requests.patch(url, headers=HEADERS, json=payload)
+    res = NOTION_SESSION.patch(url, data=orjson.dumps(payload))
     res.raise_for_status()
-    return res.json()
+    return orjson.loads(res.content)
 
 
 def create_page(db_id, properties, children=None):
@@ -114,9 +308,9 @@ def create_page(db_id, properties, children=None):
     body = {"parent": {"database_id": db_id}, "properties": properties}
     if children:
         body["children"] = children
-    res = requests.post(url, headers=HEADERS, json=body)
+    res = NOTION_SESSION.post(url, data=orjson.dumps(body))
     res.raise_for_status()
-    return res.json()
+    return orjson.loads(res.content)
 
 
 # =========================================================
@@ -134,18 +328,35 @@ def safe_number(props, field_name):
     return num or 0
 
 
-def safe_checkbox(props, field_name):
-    field = props.get(field_name) or {}
-    cb = field.get("checkbox")
-    return bool(cb)
+TaskView = namedtuple("TaskView", "status type planned actual auto_roll rollovers")
+_EMPTY = {}
+
+
+def task_view(props):
+    """Все поля задачи для статистики и auto-roll — за один проход по props."""
+    get = props.get
+    return TaskView(
+        status=((get("Status") or _EMPTY).get("select") or _EMPTY).get("name"),
+        type=((get("Type") or _EMPTY).get("select") or _EMPTY).get("name"),
+        planned=(get("Planned duration (min)") or _EMPTY).get("number") or 0,
+        actual=(get("Actual duration (min)") or _EMPTY).get("number") or 0,
+        auto_roll=bool((get("Auto-roll?") or _EMPTY).get("checkbox")),
+        rollovers=(get("Rollovers") or _EMPTY).get("number") or 0,
+    )
+
+
+# control chars + latin-1 range, removed in one C-level pass
+_CLEAN_TABLE = str.maketrans(
+    "",
+    "",
+    "".join(map(chr, range(0x00, 0x20))) + "".join(map(chr, range(0x80, 0x100))),
+)
 
 
 def clean_text(txt: str) -> str:
     if txt is None:
         return ""
-    txt = txt.replace("\r", " ").replace("\n\n\n", "\n")
-    txt = re.sub(r"[\x00-\x1f\x80-\xff]", "", txt)
-    return txt.strip()
+    return txt.replace("\r", " ").translate(_CLEAN_TABLE).strip()
 
 
 # =========================================================
@@ -158,54 +369,50 @@ def get_tasks_for_date(date):
             "date": {"equals": date.isoformat()},
         }
     }
-    data = query_database(TASKS_DB_ID, payload)
-    return data["results"]
+    return list(query_database_all(TASKS_DB_ID, payload, TASK_PROPERTIES))
 
 
-def ensure_daily_recurring_tasks(target_day):
+def ensure_daily_recurring_tasks(target_day, existing_tasks=None):
     """
     Создаем фиксированный набор задач на target_day, если их нет.
+    existing_tasks — уже загруженные задачи этого дня (иначе грузим сами).
+    Возвращает созданные страницы.
     """
-    created = 0
+    if existing_tasks is None:
+        existing_tasks = get_tasks_for_date(target_day)
+    # заголовок может быть разбит на несколько rich-text кусков
+    # (форматирование, упоминания) — сравниваем склеенный текст
+    existing_names = {
+        "".join(r["plain_text"] for r in p["properties"]["Name"]["title"])
+        for p in existing_tasks
+        if p["properties"]["Name"]["title"]
+    }
+
+    date_prop = {"date": {"start": target_day.isoformat()}}
+    new_props = []
     for t in DAILY_RECURRING_TASKS:
         name = t["name"]
         planned = t["planned"]
         ttype = t["type"]
 
-        payload = {
-            "filter": {
-                "and": [
-                    {
-                        "property": "Date",
-                        "date": {"equals": target_day.isoformat()},
-                    },
-                    {
-                        "property": "Name",
-                        "title": {"equals": name},
-                    },
-                ]
-            }
-        }
-
-        data = query_database(TASKS_DB_ID, payload)
-        if data["results"]:
+        if name in existing_names:
             continue
 
-        props = {
-            "Name": {"title": [{"text": {"content": name}}]},
-            "Date": {"date": {"start": target_day.isoformat()}},
-            "Status": {"select": {"name": "Todo"}},
-            "Type": {"select": {"name": ttype}},
-            "Auto-roll?": {"checkbox": False},
-            "Rollovers": {"number": 0},
-            "Planned duration (min)": {"number": planned},
-            "Actual duration (min)": {"number": 0},
-        }
-
-        create_page(TASKS_DB_ID, props)
-        created += 1
+        new_props.append(
+            {
+                **_RECURRING_STATIC_PROPS,
+                "Name": {"title": [{"text": {"content": name}}]},
+                "Date": date_prop,
+                "Type": {"select": {"name": ttype}},
+                "Planned duration (min)": {"number": planned},
+            }
+        )
 
-    return created
+    return run_parallel(
+        lambda props: create_page(TASKS_DB_ID, props),
+        new_props,
+        NOTION_MAX_WORKERS,
+    )
 
 
 # =========================================================
@@ -213,80 +420,97 @@ def ensure_daily_recurring_tasks(target_day):
 # =========================================================
 def auto_roll_tasks(tasks, target_day):
     tomorrow = target_day + timedelta(days=1)
-    rolled_count = 0
+    updates = []
 
     for task in tasks:
-        props = task.get("properties", {})
-        status = safe_select_name(props, "Status")
-        auto_flag = safe_checkbox(props, "Auto-roll?")
-
-        if status == "Done" or not auto_flag:
+        view = task_view(task.get("properties") or _EMPTY)
+        # большинство задач либо без auto-roll, либо Done — сразу дальше
+        if not view.auto_roll or view.status == "Done":
             continue
 
-        page_id = task["id"]
-        current_roll = safe_number(props, "Rollovers")
-
-        update_page(
-            page_id,
-            {
-                "properties": {
-                    "Date": {"date": {"start": tomorrow.isoformat()}},
-                    "Rollovers": {"number": current_roll + 1},
-                }
-            },
+        updates.append(
+            (
+                task["id"],
+                {
+                    "properties": {
+                        "Date": {"date": {"start": tomorrow.isoformat()}},
+                        "Rollovers": {"number": view.rollovers + 1},
+                    }
+                },
+            )
         )
-        rolled_count += 1
 
-    return rolled_count
+    def roll(update):
+        page_id, payload = update
+        try:
+            update_page(page_id, payload)
+            return True
+        except Exception as e:
+            print(f"Failed to roll over task {page_id}: {e}")
+            return False
+
+    # страницы независимы → PATCH-и уходят параллельно;
+    # ошибка одной не отменяет остальные
+    return sum(run_parallel(roll, updates, NOTION_MAX_WORKERS))
 
 
 # =========================================================
 # 📊 STATS
 # =========================================================
 def calculate_stats(tasks):
-    total = len(tasks)
-    done = 0
-    planned = 0
-    actual = 0
-    deep = 0
-
-    for t in tasks:
-        p = t.get("properties", {})
-
-        status = safe_select_name(p, "Status")
-        if status == "Done":
-            done += 1
-
-        planned += safe_number(p, "Planned duration (min)")
-        a = safe_number(p, "Actual duration (min)")
-        actual += a
-
-        if safe_select_name(p, "Type") == "Deep work":
-            deep += a
+    views = [task_view(t.get("properties") or _EMPTY) for t in tasks]
 
     return {
-        "total": total,
-        "done": done,
-        "planned_min": planned,
-        "actual_min": actual,
-        "deep_work_min": deep,
+        "total": len(views),
+        "done": sum(v.status == "Done" for v in views),
+        "planned_min": sum(v.planned for v in views),
+        "actual_min": sum(v.actual for v in views),
+        "deep_work_min": sum(v.actual for v in views if v.type == "Deep work"),
     }
 
 
 # =========================================================
 # 📚 STRATEGY SNAPSHOT
 # =========================================================
+def _read_cache(name, key, ttl):
+    try:
+        with open(os.path.join(CACHE_DIR, name), "rb") as f:
+            entry = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    if entry.get("key") != key or time.time() - entry.get("ts", 0) >= ttl:
+        return None
+    return entry.get("data")
+
+
+def _write_cache(name, key, data):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(os.path.join(CACHE_DIR, name), "wb") as f:
+            f.write(orjson.dumps({"key": key, "ts": time.time(), "data": data}))
+    except OSError as e:
+        print("Cache write failed:", e)
+
+
 def load_strategy_snapshot():
     if not STRATEGY_DB_ID:
         return "Нет данных стратегии (STRATEGY_DB_ID не задан)."
 
+    if not NOTION_CACHE_BUST:
+        cached = _read_cache(
+            "strategy.json", STRATEGY_DB_ID, STRATEGY_CACHE_TTL_SECONDS
+        )
+        if cached is not None:
+            return cached
+
     try:
-        data = query_database(STRATEGY_DB_ID, {})
+        data = query_database(STRATEGY_DB_ID, {"page_size": 50}, STRATEGY_PROPERTIES)
+        pages = data.get("results", [])
     except Exception as e:
         return f"Не удалось загрузить стратегию: {e}"
 
     lines = []
-    for page in data.get("results", []):
+    for page in pages:
         props = page.get("properties", {})
         name_parts = props.get("Name", {}).get("title", [])
         name = name_parts[0]["plain_text"] if name_parts else "Без названия"
@@ -298,36 +522,99 @@ def load_strategy_snapshot():
         line = f"{name} [Status: {status}, Priority: {priority}, Horizon: {horizon}]"
         lines.append(line)
 
-    if not lines:
-        return "Стратегия не заполнена."
-    return "\n".join(lines[:50])
+    snapshot = "\n".join(lines) if lines else "Стратегия не заполнена."
+    _write_cache("strategy.json", STRATEGY_DB_ID, snapshot)
+    return snapshot
 
 # =========================================================
 # 🧠 AI CLIENT
 # =========================================================
+_AI_CLIENT = None
+
+
 def ai_client():
-    import openai
+    # один клиент (и один пул соединений) на весь запуск
+    global _AI_CLIENT
+    if _AI_CLIENT is None:
+        _AI_CLIENT = openai.OpenAI(
+            base_url=OPENROUTER_BASE_URL,
+            api_key=OPENAI_API_KEY,
+        )
+    return _AI_CLIENT
+
 
-    return openai.OpenAI(
-        base_url=OPENROUTER_BASE_URL,
-        api_key=OPENAI_API_KEY,
+# ---------------------------------------------------------
+# 🗄️ AI COMMENT CACHE (SQLite)
+# ---------------------------------------------------------
+def _ai_cache_connect():
+    conn = sqlite3.connect(AI_CACHE_PATH, timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ai_cache "
+        "(key TEXT PRIMARY KEY, value TEXT, ts INTEGER)"
     )
+    return conn
+
+
+def ai_cache_get(key):
+    try:
+        with closing(_ai_cache_connect()) as conn:
+            row = conn.execute(
+                "SELECT value, ts FROM ai_cache WHERE key = ?", (key,)
+            ).fetchone()
+    except sqlite3.Error as e:
+        print("AI cache read failed:", e)
+        return None
+
+    if row and time.time() - row[1] < AI_CACHE_TTL_SECONDS:
+        return row[0]
+    return None
+
+
+def ai_cache_put(key, value):
+    try:
+        with closing(_ai_cache_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, value, ts) VALUES (?, ?, ?)",
+                (key, value, int(time.time())),
+            )
+    except sqlite3.Error as e:
+        print("AI cache write failed:", e)
 
 
 # ---------------------------------------------------------
 # 🧠 AI COMMENT FOR TASK
 # ---------------------------------------------------------
-def ai_comment_for_task(task):
-    client = ai_client()
-
+def task_brief(task):
+    """Поля задачи, из которых строится AI-комментарий (и ключ его кеша)."""
     props = task.get("properties", {})
     name_parts = props.get("Name", {}).get("title", [])
-    name = name_parts[0]["plain_text"] if name_parts else "Без названия"
+    return {
+        "name": name_parts[0]["plain_text"] if name_parts else "Без названия",
+        "type": safe_select_name(props, "Type") or "-",
+        "complexity": safe_number(props, "Complexity"),
+        "rollovers": safe_number(props, "Rollovers"),
+        "planned": safe_number(props, "Planned duration (min)"),
+    }
 
-    task_type = safe_select_name(props, "Type") or "-"
-    complexity = safe_number(props, "Complexity")
-    rollovers = safe_number(props, "Rollovers")
-    planned = safe_number(props, "Planned duration (min)")
+
+def comment_cache_key(brief):
+    return hashlib.sha256(
+        "{name}|{type}|{complexity}|{rollovers}|{planned}".format(**brief).encode()
+    ).hexdigest()
+
+
+def ai_comment_for_task(task, check_cache=True):
+    brief = task_brief(task)
+    name = brief["name"]
+    task_type = brief["type"]
+    complexity = brief["complexity"]
+    rollovers = brief["rollovers"]
+    planned = brief["planned"]
+
+    key = comment_cache_key(brief)
+    cached = ai_cache_get(key) if check_cache else None
+    if cached is not None:
+        return cached
 
     prompt = f"""
 Ты — мой строгий, но адекватный продакт-наставник.
@@ -346,6 +633,7 @@ def ai_comment_for_task(task):
 Ответь ОДНИМ параграфом без переносов строк.
 """
 
+    client = ai_client()
     resp = client.chat.completions.create(
         model=MODEL_NAME,
         messages=[{"role": "user", "content": prompt}],
@@ -353,8 +641,10 @@ def ai_comment_for_task(task):
         temperature=0.3,
     )
 
-    text = resp.choices[0].message.content
-    return clean_text(text)
+    text = clean_text(resp.choices[0].message.content)
+    if text:
+        ai_cache_put(key, text)
+    return text
 
 
 # ---------------------------------------------------------
@@ -367,33 +657,100 @@ def load_advice_lines():
     if not ADVICE_FILE_PATH or not os.path.exists(ADVICE_FILE_PATH):
         return []
 
+    lines = []
     with open(ADVICE_FILE_PATH, "r", encoding="utf-8", errors="ignore") as f:
-        content = f.read()
-
-    raw_lines = [clean_text(x) for x in content.split("\n")]
-    lines = [x for x in raw_lines if 40 <= len(x) <= 300]
+        for raw in f:
+            # clean_text только укорачивает строку → короткие отсекаем сразу
+            if len(raw.rstrip("\n")) < 40:
+                continue
+            line = clean_text(raw)
+            if 40 <= len(line) <= 300:
+                lines.append(line)
     return lines
 
 
-def pick_daily_advice(lines):
+def pick_daily_advice(lines, day=None):
+    """С day выбор детерминирован: один и тот же совет на весь день."""
     import random
 
     if not lines:
         return ""
-    return random.choice(lines)
+    rng = random.Random(day.toordinal()) if day else random
+    return rng.choice(lines)
 
 
 # ---------------------------------------------------------
 # 🧠 AI SUMMARY + PLAN (JSON)
 # ---------------------------------------------------------
-def generate_ai_summary_and_plan(stats, target_day, strategy_snapshot):
+_JSON_DECODER = json.JSONDecoder()
+
+
+def stream_json_completion(client, **kwargs):
+    """
+    Стримим ответ модели и закрываем поток, как только в буфере собрался
+    целый JSON-объект. Возвращает (объект или None, весь полученный текст).
+    """
+    stream = client.chat.completions.create(stream=True, **kwargs)
+    buf = ""
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            buf += delta
+            if "}" not in delta:
+                continue
+            start = buf.find("{")
+            if start == -1:
+                continue
+            try:
+                data, _ = _JSON_DECODER.raw_decode(buf, start)
+            except ValueError:
+                continue
+            return data, buf
+    finally:
+        stream.close()
+    return None, buf
+
+
+def generate_ai_summary_and_plan(stats, target_day, strategy_snapshot, tasks=()):
+    """
+    Один запрос к модели: разбор дня, связь со стратегией, план и,
+    если переданы tasks, короткие комментарии к этим задачам.
+    Возвращает (summary, strategy_alignment, plan_list, {page_id: comment}).
+    """
     client = ai_client()
 
+    # короткие ключи вместо page id — модели проще их повторить без ошибок;
+    # задачи сверх лимита получат комментарий отдельным запросом
+    refs = {
+        f"t{i}": task
+        for i, task in enumerate(tasks[:AI_FUSED_COMMENTS_MAX], 1)
+    }
+    briefs = {ref: task_brief(task) for ref, task in refs.items()}
+
+    tasks_block = ""
+    comments_format = ""
+    if briefs:
+        tasks_payload = [{"id": ref, **brief} for ref, brief in briefs.items()]
+        tasks_block = f"""
+Вот задачи на сегодня (planned — плановое время в минутах):
+{orjson.dumps(tasks_payload).decode()}
+
+4) Для каждой задачи дать один короткий комментарий (1–2 предложения,
+без markdown и эмодзи): как лучше выполнить, что важно учесть, а если
+задача слишком большая — предложить упрощение.
+"""
+        comments_format = """,
+  "comments": {
+    "t1": "Комментарий к задаче t1"
+  }"""
+
     prompt = f"""
 Ты — мой персональный ИИ-коуч и стратег.
 
 Вот статистика дня ({target_day}):
-{json.dumps(stats, ensure_ascii=False, indent=2)}
+{orjson.dumps(stats, option=orjson.OPT_INDENT_2).decode()}
 
 Вот краткий срез моей стратегии (из отдельной базы Strategy):
 {strategy_snapshot}
@@ -402,7 +759,7 @@ def generate_ai_summary_and_plan(stats, target_day, strategy_snapshot):
 1) Кратко и чётко описать, как прошёл день.
 2) Оценить, насколько день соответствует долгосрочной стратегии.
 3) Сформировать конкретный план на завтра.
-
+{tasks_block}
 Формат ответа СТРОГО в JSON:
 
 {{
@@ -411,23 +768,21 @@ def generate_ai_summary_and_plan(stats, target_day, strategy_snapshot):
   "plan_tomorrow": [
     "Пункт плана 1",
     "Пункт плана 2"
-  ]
+  ]{comments_format}
 }}
 """
 
-    resp = client.chat.completions.create(
+    data, raw = stream_json_completion(
+        client,
         model=MODEL_NAME,
         messages=[{"role": "user", "content": prompt}],
-        max_tokens=700,
+        max_tokens=700 + 80 * len(briefs),
         temperature=0.4,
     )
 
-    raw = resp.choices[0].message.content.strip()
-
-    try:
-        data = json.loads(raw)
-    except Exception:
-        return clean_text(raw), "", []
+    if not isinstance(data, dict):
+        # обычно ответ обрезан по max_tokens — в лог только начало
+        return clean_text(raw)[:NOTION_TEXT_LIMIT], "", [], {}
 
     summary = clean_text(data.get("summary", ""))
     strategy_alignment = clean_text(data.get("strategy_alignment", ""))
@@ -435,7 +790,21 @@ def generate_ai_summary_and_plan(stats, target_day, strategy_snapshot):
     if not isinstance(plan_list, list):
         plan_list = []
 
-    return summary, strategy_alignment, [clean_text(x) for x in plan_list]
+    comments = {}
+    raw_comments = data.get("comments")
+    if isinstance(raw_comments, dict):
+        for ref, task in refs.items():
+            text = clean_text(str(raw_comments.get(ref) or ""))
+            if text:
+                comments[task["id"]] = text
+                ai_cache_put(comment_cache_key(briefs[ref]), text)
+
+    return (
+        summary,
+        strategy_alignment,
+        [clean_text(x) for x in plan_list],
+        comments,
+    )
 
 
 # =========================================================
@@ -456,12 +825,10 @@ def create_daily_log(
     stats,
     summary,
     strategy_alignment,
-    plan_list,
+    plan_text,
     target_day,
     daily_advice,
 ):
-    plan_text = "\n".join(f"- {p}" for p in plan_list) if plan_list else ""
-
     props = {
         "Name": {"title": [{"text": {"content": f"Day {target_day}"}}]},
         "Date": {"date": {"start": target_day.isoformat()}},
@@ -476,7 +843,7 @@ def create_daily_log(
         },
         "Raw data (JSON)": {
             "rich_text": [
-                {"text": {"content": json.dumps(stats, ensure_ascii=False)}}
+                {"text": {"content": orjson.dumps(stats).decode()}}
             ]
         },
     }
@@ -564,14 +931,32 @@ def send_telegram_message(text: str):
     }
 
     try:
-        res = requests.post(url, json=payload, timeout=15)
+        res = HTTP_SESSION.post(url, json=payload, timeout=15)
         if not res.ok:
             print("Telegram sendMessage error:", res.text)
     except Exception as e:
         print("Telegram sendMessage exception:", e)
 
 
-def send_telegram_document(file_path: str, caption: str | None = None):
+DOCX_MIME_TYPE = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+
+
+def _as_upload(document: str | bytes, filename: str | None = None):
+    """(имя, BytesIO, mime) для multipart: путь читаем с диска, bytes оборачиваем."""
+    if isinstance(document, bytes):
+        return filename or "plan.docx", io.BytesIO(document), DOCX_MIME_TYPE
+    with open(document, "rb") as f:
+        name = filename or os.path.basename(document)
+        return name, io.BytesIO(f.read()), DOCX_MIME_TYPE
+
+
+def send_telegram_document(
+    document: str | bytes,
+    caption: str | None = None,
+    filename: str | None = None,
+):
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("Telegram not configured, skipping send_telegram_document")
         return
@@ -579,12 +964,11 @@ def send_telegram_document(file_path: str, caption: str | None = None):
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendDocument"
 
     try:
-        with open(file_path, "rb") as f:
-            files = {"document": f}
-            data = {"chat_id": TELEGRAM_CHAT_ID}
-            if caption:
-                data["caption"] = caption
-            res = requests.post(url, data=data, files=files, timeout=30)
+        files = {"document": _as_upload(document, filename)}
+        data = {"chat_id": TELEGRAM_CHAT_ID}
+        if caption:
+            data["caption"] = caption
+        res = HTTP_SESSION.post(url, data=data, files=files, timeout=60)
         if not res.ok:
             print("Telegram sendDocument error:", res.text)
     except Exception as e:
@@ -605,7 +989,7 @@ def send_discord_message(content: str):
 
     try:
         safe_content = _truncate_for_discord(content or "")
-        res = requests.post(
+        res = HTTP_SESSION.post(
             DISCORD_WEBHOOK_URL,
             json={"content": safe_content},
             timeout=15,
@@ -616,23 +1000,26 @@ def send_discord_message(content: str):
         print("Discord send message exception:", e)
 
 
-def send_discord_file(file_path: str, content: str | None = None):
+def send_discord_file(
+    document: str | bytes,
+    content: str | None = None,
+    filename: str | None = None,
+):
     if not DISCORD_WEBHOOK_URL:
         print("Discord not configured, skipping send_discord_file")
         return
 
     try:
-        with open(file_path, "rb") as f:
-            files = {"file": f}
-            data = {}
-            if content:
-                data["content"] = _truncate_for_discord(content)
-            res = requests.post(
-                DISCORD_WEBHOOK_URL,
-                data=data,
-                files=files,
-                timeout=30,
-            )
+        files = {"file": _as_upload(document, filename)}
+        data = {}
+        if content:
+            data["content"] = _truncate_for_discord(content)
+        res = HTTP_SESSION.post(
+            DISCORD_WEBHOOK_URL,
+            data=data,
+            files=files,
+            timeout=30,
+        )
         if not res.ok:
             print("Discord send file error:", res.text)
     except Exception as e:
@@ -641,6 +1028,23 @@ def send_discord_file(file_path: str, content: str | None = None):
 # =========================================================
 # 📄 DOCX GENERATION
 # =========================================================
+def _docx_paragraph(text, style=None, bold=False):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    rpr = "<w:rPr><w:b/></w:rPr>" if bold else ""
+    return (
+        f"<w:p>{ppr}<w:r>{rpr}"
+        f'<w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+    )
+
+
+def _replace_paragraph(xml, placeholder, new_xml):
+    """Заменяем целиком абзац шаблона, в котором стоит placeholder."""
+    pos = xml.index(placeholder)
+    start = max(xml.rfind("<w:p>", 0, pos), xml.rfind("<w:p ", 0, pos))
+    end = xml.index("</w:p>", pos) + len("</w:p>")
+    return xml[:start] + new_xml + xml[end:]
+
+
 def build_plan_docx(
     plan_day,
     summary_day,
@@ -648,24 +1052,23 @@ def build_plan_docx(
     plan_list,
     daily_advice,
 ):
+    """
+    Собираем DOCX из plan_template.docx: готовим XML абзацев строками
+    и подставляем их на место плейсхолдеров в word/document.xml.
+    """
     filename = f"plan_{plan_day.isoformat()}.docx"
-    doc = Document()
-
-    doc.add_heading(f"Plan for {plan_day}", level=1)
 
     # AI plan
-    doc.add_heading("AI Plan", level=2)
     if plan_list:
-        for item in plan_list:
-            doc.add_paragraph(item, style="List Bullet")
+        plan_xml = "".join(_docx_paragraph(item, "ListBullet") for item in plan_list)
     else:
-        doc.add_paragraph("No explicit plan from AI.")
+        plan_xml = _docx_paragraph("No explicit plan from AI.")
 
     # Tasks
-    doc.add_heading("Tasks for the day", level=2)
     if not tasks_for_day:
-        doc.add_paragraph("No tasks found.")
+        tasks_xml = _docx_paragraph("No tasks found.")
     else:
+        parts = []
         for t in tasks_for_day:
             name = t["name"]
             ttype = t["type"]
@@ -673,77 +1076,116 @@ def build_plan_docx(
             comment = t["comment"]
             advice = t.get("advice", "")
 
-            p = doc.add_paragraph(style="List Number")
-            p.add_run(f"{name} [{ttype}] — {planned} min").bold = True
-
+            parts.append(
+                _docx_paragraph(
+                    f"{name} [{ttype}] — {planned} min", "ListNumber", bold=True
+                )
+            )
             if comment:
-                doc.add_paragraph(f"AI comment: {comment}")
+                parts.append(_docx_paragraph(f"AI comment: {comment}"))
             if advice:
-                doc.add_paragraph(f"Advice: {advice}")
+                parts.append(_docx_paragraph(f"Advice: {advice}"))
+        tasks_xml = "".join(parts)
 
+    advice_xml = ""
     if daily_advice:
-        doc.add_heading("Daily Advice", level=2)
-        doc.add_paragraph(daily_advice)
+        advice_xml = "".join(
+            [_docx_paragraph("Daily Advice", "Heading2"), _docx_paragraph(daily_advice)]
+        )
+
+    with zipfile.ZipFile(PLAN_TEMPLATE_PATH) as tpl:
+        xml = tpl.read("word/document.xml").decode("utf-8")
+        xml = xml.replace("{{PLAN_DAY}}", escape(str(plan_day)))
+        xml = _replace_paragraph(xml, "{{PLAN_LIST}}", plan_xml)
+        xml = _replace_paragraph(xml, "{{TASK_LIST}}", tasks_xml)
+        xml = _replace_paragraph(xml, "{{DAILY_ADVICE}}", advice_xml)
+
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as out:
+            for item in tpl.infolist():
+                if item.filename == "word/document.xml":
+                    out.writestr(item.filename, xml)
+                else:
+                    out.writestr(item.filename, tpl.read(item.filename))
 
-    doc.save(filename)
     return filename
 
 
 # =========================================================
 # 🌅 TASKS FOR DAY: AI COMMENT + ADVICE
 # =========================================================
-def prepare_tasks_for_day(day, advice_lines):
-    tasks = get_tasks_for_date(day)
-    print(f"Found {len(tasks)} tasks for day ({day})")
+def _enrich_task(task):
+    props = task.get("properties", {})
+    name_parts = props.get("Name", {}).get("title", [])
+    name = name_parts[0]["plain_text"] if name_parts else "Без названия"
 
-    enriched = []
+    task_type = safe_select_name(props, "Type") or "-"
+    planned = safe_number(props, "Planned duration (min)")
 
-    for task in tasks:
-        props = task.get("properties", {})
-        name_parts = props.get("Name", {}).get("title", [])
-        name = name_parts[0]["plain_text"] if name_parts else "Без названия"
+    advice = ""
+
+    return {
+        "name": name,
+        "type": task_type,
+        "planned": planned,
+        "comment": None,
+        "advice": advice,
+    }
 
-        task_type = safe_select_name(props, "Type") or "-"
-        planned = safe_number(props, "Planned duration (min)")
 
-        # AI comment
+def _task_comment(task, name, comments=None):
+    # AI comment: из общего запроса, иначе отдельным (кешируемым) запросом
+    # если comments переданы, main() уже сложил туда все попадания кеша
+    comment = (comments or {}).get(task["id"])
+    if comment is None:
         try:
-            comment = ai_comment_for_task(task)
+            comment = ai_comment_for_task(task, check_cache=comments is None)
         except Exception as e:
             print(f"AI comment failed for task '{name}': {e}")
             comment = ""
+    return comment
 
-        advice = ""
 
-        # save AI comment to Notion
-        try:
-            update_page(
-                task["id"],
-                {
-                    "properties": {
-                        "AI comment": {
-                            "rich_text": [
-                                {"text": {"content": comment or ""}}
-                            ]
-                        }
-                    }
-                },
-            )
-        except Exception as e:
-            print(f"Failed to update AI comment in Notion for '{name}': {e}")
-
-        enriched.append(
+def _save_ai_comment(task, name, comment):
+    try:
+        update_page(
+            task["id"],
             {
-                "name": name,
-                "type": task_type,
-                "planned": planned,
-                "comment": comment,
-                "advice": advice,
-            }
+                "properties": {
+                    "AI comment": {
+                        "rich_text": [
+                            {"text": {"content": comment or ""}}
+                        ]
+                    }
+                }
+            },
         )
+    except Exception as e:
+        print(f"Failed to update AI comment in Notion for '{name}': {e}")
 
-    daily_advice = pick_daily_advice(advice_lines)
-    return enriched, daily_advice
+
+def prepare_tasks_for_day(day, comments=None, tasks=None):
+    if tasks is None:
+        tasks = get_tasks_for_date(day)
+    print(f"Found {len(tasks)} tasks for day ({day})")
+
+    pairs = [(task, _enrich_task(task)) for task in tasks]
+
+    # AI-фоллбек (только задачи без комментария из общего запроса) — пул AI
+    task_comments = run_parallel(
+        lambda pair: _task_comment(pair[0], pair[1]["name"], comments),
+        pairs,
+        AI_MAX_WORKERS,
+    )
+    for (_, row), comment in zip(pairs, task_comments):
+        row["comment"] = comment
+
+    # запись в Notion — свой пул под NOTION_MAX_WORKERS, как и везде
+    run_parallel(
+        lambda pair: _save_ai_comment(pair[0], pair[1]["name"], pair[1]["comment"]),
+        pairs,
+        NOTION_MAX_WORKERS,
+    )
+    return [row for _, row in pairs]
 
 
 # =========================================================
@@ -751,7 +1193,7 @@ def prepare_tasks_for_day(day, advice_lines):
 # =========================================================
 def main():
     today = get_today()
-    summary_day = get_target_day_for_summary()  # ВЧЕРА
+    summary_day = get_target_day_for_summary(today)  # ВЧЕРА
     plan_day = today                             # СЕГОДНЯ
 
     print(
@@ -776,40 +1218,71 @@ def main():
     stats = calculate_stats(tasks_yesterday)
     print("Stats:", stats)
 
-    # 2) Strategy snapshot
+    # 2) Ensure recurring tasks НА СЕГОДНЯ (FIX)
+    # грузим после auto-roll, чтобы перенесенные задачи тоже были в списке
+    existing_today = get_tasks_for_date(plan_day)
+    created_recurring = ensure_daily_recurring_tasks(plan_day, existing_today)
+    print(f"Created {len(created_recurring)} recurring tasks for {plan_day}")
+    # create_page возвращает готовые страницы → повторный запрос не нужен
+    tasks_for_plan = existing_today + created_recurring
+
+    # 3) Strategy snapshot
     strategy_snapshot = load_strategy_snapshot()
     print("Strategy snapshot loaded")
 
-    # 3) AI summary + PLAN НА СЕГОДНЯ
-    summary, strategy_alignment, plan_list = generate_ai_summary_and_plan(
-        stats, summary_day, strategy_snapshot
+    # 4) AI summary + PLAN НА СЕГОДНЯ + комментарии к задачам — одним запросом
+    #    (задачи с комментарием в кеше в промпт не попадают)
+    comments = {}
+    uncommented = []
+    for t in tasks_for_plan:
+        cached = ai_cache_get(comment_cache_key(task_brief(t)))
+        if cached is None:
+            uncommented.append(t)
+        else:
+            comments[t["id"]] = cached
+
+    summary, strategy_alignment, plan_list, ai_comments = generate_ai_summary_and_plan(
+        stats, summary_day, strategy_snapshot, uncommented
     )
-    print("AI summary + plan generated")
+    comments.update(ai_comments)
+    print(f"AI summary + plan generated ({len(ai_comments)} task comments)")
 
-    # 4) Daily log (за вчера)
-    daily_advice_for_log = pick_daily_advice(advice_lines)
+    # 5) Daily log (за вчера)
+    daily_advice = pick_daily_advice(advice_lines, plan_day)
+    plan_text = "\n".join(["- " + p for p in plan_list])
     daily_log_page = create_daily_log(
         stats,
         summary,
         strategy_alignment,
-        plan_list,
+        plan_text,
         summary_day,
-        daily_advice_for_log,
+        daily_advice,
     )
     print("Daily log created:", daily_log_page.get("id"))
 
-    # 5) Ensure recurring tasks НА СЕГОДНЯ (FIX)
-    created_recurring = ensure_daily_recurring_tasks(plan_day)
-    print(f"Created {created_recurring} recurring tasks for {plan_day}")
-
     # 6) Prepare tasks НА СЕГОДНЯ (FIX)
-    tasks_today, daily_advice = prepare_tasks_for_day(plan_day, advice_lines)
+    tasks_today = prepare_tasks_for_day(plan_day, comments, tasks_for_plan)
     print(
         f"Prepared {len(tasks_today)} tasks for {plan_day}; "
         f"daily advice: {bool(daily_advice)}"
     )
 
-    # 7) Send SHORT plan message (Telegram / Discord)
+    # 7) DOCX
+    docx_path = build_plan_docx(
+        plan_day=plan_day,
+        summary_day=summary_day,
+        tasks_for_day=tasks_today,
+        plan_list=plan_list,
+        daily_advice=daily_advice,
+    )
+    print("DOCX generated:", docx_path)
+
+    # читаем один раз, оба канала шлют одни и те же bytes
+    with open(docx_path, "rb") as f:
+        docx_bytes = f.read()
+    docx_name = os.path.basename(docx_path)
+
+    # 8) Send SHORT plan message + DOCX (Telegram / Discord)
     tasks_count = len(tasks_today)
     planned_minutes = sum(t["planned"] for t in tasks_today)
 
@@ -819,23 +1292,19 @@ def main():
         f"• Планируемое время: {planned_minutes} мин\n\n"
         f"📄 Подробный план — в документе ниже"
     )
+    caption = f"План на {plan_day}"
 
-    send_telegram_message(short_message)
-    send_discord_message(short_message)
+    def send_to_telegram():
+        send_telegram_message(short_message)
+        send_telegram_document(docx_bytes, caption=caption, filename=docx_name)
 
+    def send_to_discord():
+        send_discord_message(short_message)
+        send_discord_file(docx_bytes, content=caption, filename=docx_name)
 
-    # 8) DOCX
-    docx_path = build_plan_docx(
-        plan_day=plan_day,
-        summary_day=summary_day,
-        tasks_for_day=tasks_today,
-        plan_list=plan_list,
-        daily_advice=daily_advice,
-    )
-    print("DOCX generated:", docx_path)
-
-    send_telegram_document(docx_path, caption=f"План на {plan_day}")
-    send_discord_file(docx_path, content=f"План на {plan_day}")
+    # каналы независимы → шлем параллельно; внутри канала порядок сохраняем,
+    # чтобы документ приходил после сообщения
+    run_parallel(lambda send: send(), [send_to_telegram, send_to_discord], 2)
 
     print("\n=== DONE ===\n")
 
@@ -1,6 +1,8 @@
 import os
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 load_dotenv()
 
@@ -9,18 +11,55 @@ NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 HEADERS = {
     "Authorization": f"Bearer {NOTION_API_KEY}",
     "Notion-Version": "2022-06-28",
-    "Content-Type": "application/json"
+    "Content-Type": "application/json",
+    "Accept-Encoding": "gzip"
 }
 
+class PageCreateRetry(Retry):
+    # POST /v1/pages is not idempotent: retry page creation only on 429
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method == "POST":
+            return status_code == 429
+        return super().is_retry(method, status_code, has_retry_after)
+
+def make_adapter(retry_cls=Retry, methods=("GET", "POST", "PATCH")):
+    return HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=retry_cls(
+            total=8,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(methods),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+    )
+
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://api.notion.com", make_adapter())
+# longest prefix wins: create_page retries only on 429, update_page keeps 5xx
+SESSION.mount("https://api.notion.com/v1/pages", make_adapter(PageCreateRetry, ("GET", "PATCH")))
+
 def query_database(db_id, payload=None):
     url = f"https://api.notion.com/v1/databases/{db_id}/query"
-    res = requests.post(url, headers=HEADERS, json=payload or {})
+    res = SESSION.post(url, json=payload or {})
     res.raise_for_status()
     return res.json()
 
+def query_database_all(db_id, payload=None):
+    payload = dict(payload or {})
+    while True:
+        data = query_database(db_id, payload)
+        yield from data["results"]
+        if not data.get("has_more"):
+            return
+        payload["start_cursor"] = data["next_cursor"]
+
 def update_page(page_id, payload):
     url = f"https://api.notion.com/v1/pages/{page_id}"
-    res = requests.patch(url, headers=HEADERS, json=payload)
+    res = SESSION.patch(url, json=payload)
     res.raise_for_status()
     return res.json()
 
@@ -32,6 +71,6 @@ def create_page(db_id, properties, children=None):
     }
     if children:
         body["children"] = children
-    res = requests.post(url, headers=HEADERS, json=body)
+    res = SESSION.post(url, json=body)
     res.raise_for_status()
     return res.json()
@@ -1,14 +1,14 @@
-from notion_client import query_database
+from notion_client import query_database_all
 import os
 
 TASKS_DB_ID = os.getenv("TASKS_DB_ID")
 
 print("🔍 Тест: читаем Tasks...")
 
-data = query_database(TASKS_DB_ID)
-print("Количество записей:", len(data["results"]))
+results = list(query_database_all(TASKS_DB_ID))
+print("Количество записей:", len(results))
 print("Первый объект:")
-if data["results"]:
-    print(data["results"][0])
+if results:
+    print(results[0])
 else:
     print("Таблица пока пустая.")